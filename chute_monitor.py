@@ -9,9 +9,12 @@ import threading
 import logging
 from datetime import datetime
 from typing import Dict, List, Tuple
-import numpy as np
 from dataclasses import dataclass
 import os
+import random
+import selectors
+import struct
+import zlib
 
 try:
 	import serial
@@ -27,6 +30,47 @@ except ImportError:
 	LIGHT_AVAILABLE = False
 	print("Warning: pyserial not available. Light control disabled.")
 
+# Upper bound on buffered, not-yet-parsed LiDAR bytes (~28 TF-Luna frames)
+RX_BUFFER_MAX = 256
+# Per-syscall read size when draining the LiDAR port
+RX_READ_SIZE = 4096
+
+# Fixed seed so simulation-mode runs are reproducible
+_sim_rng = random.Random(0xC0FFEE)
+
+# TF-Luna payload after the 0x59 0x59 header: dist, strength, temp (uint16 LE), checksum
+_FRAME = struct.Struct('<HHHB')
+_HEADER_SUM = 0x59 + 0x59
+
+def _find_frame(buf: bytearray) -> Tuple[int, int, int]:
+	"""Locate the newest checksum-valid TF-Luna frame in buf.
+
+	Returns (index, dist_cm, strength), or (-1, 0, 0) if buf holds no complete valid frame.
+	"""
+	if len(buf) < 9:
+		# Also keeps rfind's end from going negative and counting from the back
+		return -1, 0, 0
+	# Search backwards; the header must leave room for the 7 bytes after it
+	idx = buf.rfind(b'\x59\x59', 0, len(buf) - 7)
+	while idx >= 0:
+		dist_cm, strength, _temp, checksum = _FRAME.unpack_from(buf, idx + 2)
+		if (_HEADER_SUM + sum(buf[idx + 2:idx + 8])) & 0xFF == checksum:
+			return idx, dist_cm, strength
+		# False header, resync on the previous candidate
+		idx = buf.rfind(b'\x59\x59', 0, idx + 1)
+	return -1, 0, 0
+
+# Adafruit USB tower light commands, one write per color:
+# 0x11/0x12/0x14 = RED/YELLOW/GREEN_ON, 0x21/0x22/0x24 = RED/YELLOW/GREEN_OFF, 0x28 = BUZZER_OFF
+_LIGHT_CMDS = {
+	"red": b'\x22\x24\x11',     # YELLOW_OFF, GREEN_OFF, RED_ON
+	"green": b'\x21\x22\x14',   # RED_OFF, YELLOW_OFF, GREEN_ON
+	"yellow": b'\x21\x24\x12',  # RED_OFF, GREEN_OFF, YELLOW_ON
+	"blue": b'\x21\x24\x12',    # No blue lamp - yellow is the closest
+	"white": b'\x11\x12\x14',   # All lights on
+	"off": b'\x21\x22\x24',     # All lights off
+}
+
 @dataclass
 class ChuteConfig:
 	scan_interval: float = 1.0
@@ -47,11 +91,17 @@ class ChuteMonitor:
 	def __init__(self, config: ChuteConfig):
 		self.config = config
 		self.status = ChuteStatus("unknown", 0.0, datetime.now())
-		self.calibration_data = self.load_calibration()
 		self.lidar = None
 		self.light = None
 		self.running = False
 		self.monitor_thread = None
+		self._stop_event = threading.Event()
+		self._rx = bytearray()
+		self._lidar_sel = None
+		self._last_light_color = None
+		self._lidar_lock = threading.Lock()
+		self._light_lock = threading.Lock()
+		self._prev_logged_status = None
 
 		logging.basicConfig(
 			level=logging.INFO,
@@ -59,6 +109,9 @@ class ChuteMonitor:
 			handlers=[logging.FileHandler(config.log_file), logging.StreamHandler()]
 		)
 		self.logger = logging.getLogger(__name__)
+		self.calibration_data = self.load_calibration()
+		self._refresh_calibration_cache()
+		self._publish_status()
 
 		self.init_lidar()
 		self.init_light()
@@ -68,81 +121,72 @@ class ChuteMonitor:
 			self.logger.warning("LiDAR not available - running in simulation mode")
 			return
 		try:
-			import serial
 			self.lidar = serial.Serial("/dev/ttyAMA0", 115200, timeout=1)
+			self._set_low_latency(self.lidar)
+			# Start clean; scan_chute drains any later backlog at the start of each call
+			self.lidar.reset_input_buffer()
+			self._rx.clear()
+			# Wait for data with select, then drain it with raw os.read calls
+			self._lidar_sel = selectors.DefaultSelector()
+			self._lidar_sel.register(self.lidar.fileno(), selectors.EVENT_READ)
 			self.logger.info("LiDAR initialized successfully on /dev/ttyAMA0")
 		except Exception as e:
-			self.logger.error(f"Failed to initialize LiDAR: {e}")
+			self.logger.error("Failed to initialize LiDAR: %s", e)
 			self.lidar = None
 
+	def _set_low_latency(self, port):
+		"""Best-effort: stop the serial driver from batching bytes before handing them over"""
+		try:
+			# Sets ASYNC_LOW_LATENCY via TIOCGSERIAL/TIOCSSERIAL
+			port.set_low_latency_mode(True)
+		except Exception as e:
+			self.logger.debug("Low-latency mode not supported on %s: %s", port.port, e)
+		# FTDI USB adapters also hold data for latency_timer ms (16 by default)
+		latency_file = f"/sys/bus/usb-serial/devices/{os.path.basename(port.port)}/latency_timer"
+		try:
+			with open(latency_file, "w") as f:
+				f.write("1")
+		except OSError as e:
+			# Missing for non-FTDI adapters; EACCES when the service isn't running as root
+			self.logger.debug("Could not set %s: %s", latency_file, e)
+
 	def init_light(self):
 		if not LIGHT_AVAILABLE:
 			self.logger.warning("Light not available - running without light control")
 			return
+		# Connect to the Adafruit USB tower light on /dev/ttyUSB0
 		try:
-			import serial
-			# Connect to the Adafruit USB tower light on /dev/ttyUSB0
-			try:
-				self.light = serial.Serial('/dev/ttyUSB0', 9600, timeout=1)
-				# Send cleanup commands to turn off all lights
-				self.light.write(bytes([0x28]))  # BUZZER_OFF
-				self.light.write(bytes([0x21]))  # RED_OFF
-				self.light.write(bytes([0x22]))  # YELLOW_OFF
-				self.light.write(bytes([0x24]))  # GREEN_OFF
-				self.logger.info("USB tower light initialized successfully on /dev/ttyUSB0")
-			except Exception as e:
-				self.logger.warning(f"USB tower light not found on /dev/ttyUSB0: {e}")
-				self.light = None
+			self.light = serial.Serial('/dev/ttyUSB0', 9600, timeout=1)
+			self._set_low_latency(self.light)
+			# Send cleanup commands to turn off all lights
+			self.light.write(b'\x28' + _LIGHT_CMDS["off"])  # BUZZER_OFF + all lights off
+			self._last_light_color = None
+			self.logger.info("USB tower light initialized successfully on /dev/ttyUSB0")
 		except Exception as e:
-			self.logger.error(f"Failed to initialize USB tower light: {e}")
+			self.logger.warning("USB tower light not found on /dev/ttyUSB0: %s", e)
 			self.light = None
 
 	def set_light_color(self, color: str):
 		"""Set the USB tower light color based on status"""
 		if not self.light:
 			return
-		try:
-			# Adafruit USB tower light commands
-			if color == "red":
-				# Turn off other lights first, then turn on red
-				self.light.write(bytes([0x22]))  # YELLOW_OFF
-				self.light.write(bytes([0x24]))  # GREEN_OFF
-				self.light.write(bytes([0x11]))  # RED_ON
-			elif color == "green":
-				# Turn off other lights first, then turn on green
-				self.light.write(bytes([0x21]))  # RED_OFF
-				self.light.write(bytes([0x22]))  # YELLOW_OFF
-				self.light.write(bytes([0x14]))  # GREEN_ON
-			elif color == "yellow":
-				# Turn off other lights first, then turn on yellow
-				self.light.write(bytes([0x21]))  # RED_OFF
-				self.light.write(bytes([0x24]))  # GREEN_OFF
-				self.light.write(bytes([0x12]))  # YELLOW_ON
-			elif color == "blue":
-				# Turn off other lights first, then turn on yellow (closest to blue)
-				self.light.write(bytes([0x21]))  # RED_OFF
-				self.light.write(bytes([0x24]))  # GREEN_OFF
-				self.light.write(bytes([0x12]))  # YELLOW_ON
-			elif color == "white":
-				# Turn on all lights for white
-				self.light.write(bytes([0x11]))  # RED_ON
-				self.light.write(bytes([0x12]))  # YELLOW_ON
-				self.light.write(bytes([0x14]))  # GREEN_ON
-			else:
-				# Turn off all lights
-				self.light.write(bytes([0x21]))  # RED_OFF
-				self.light.write(bytes([0x22]))  # YELLOW_OFF
-				self.light.write(bytes([0x24]))  # GREEN_OFF
-		except Exception as e:
-			self.logger.error(f"Failed to set USB tower light color: {e}")
-
-	def load_calibration(self) -> Dict:
-		if os.path.exists(self.config.calibration_file):
+		with self._light_lock:
+			if color == self._last_light_color:
+				return
 			try:
-				with open(self.config.calibration_file, 'r') as f:
-					return json.load(f)
+				self.light.write(_LIGHT_CMDS.get(color, _LIGHT_CMDS["off"]))
+				self._last_light_color = color
 			except Exception as e:
-				self.logger.error(f"Failed to load calibration: {e}")
+				self.logger.error("Failed to set USB tower light color: %s", e)
+
+	def load_calibration(self) -> Dict:
+		try:
+			with open(self.config.calibration_file, 'r') as f:
+				return json.load(f)
+		except FileNotFoundError:
+			pass
+		except Exception as e:
+			self.logger.error("Failed to load calibration: %s", e)
 		return {
 			"empty_distance": 0.0,  # inches
 			"full_distance": 0.0,   # inches
@@ -150,57 +194,55 @@ class ChuteMonitor:
 			"calibrated": False
 		}
 
+	def _refresh_calibration_cache(self):
+		"""Derive the values determine_chute_status needs; call whenever calibration_data changes"""
+		empty_d = float(self.calibration_data["empty_distance"])
+		full_d = float(self.calibration_data["full_distance"])
+		span = empty_d - full_d
+		# One tuple, one reference swap: the monitor thread never sees a half-updated set
+		self._cal = (bool(self.calibration_data["calibrated"]), empty_d, full_d, 1.0 / span if span > 0 else 0.0)
+
 	def save_calibration(self):
 		try:
 			with open(self.config.calibration_file, 'w') as f:
 				json.dump(self.calibration_data, f, indent=2)
 			self.logger.info("Calibration saved successfully")
 		except Exception as e:
-			self.logger.error(f"Failed to save calibration: {e}")
+			self.logger.error("Failed to save calibration: %s", e)
 
-	def calibrate_empty(self) -> bool:
+	def _calibrate(self, key: str, label: str, mark_calibrated: bool) -> bool:
 		if not self.lidar:
 			self.logger.warning("LiDAR not available for calibration")
 			return False
 		try:
 			distances = []
-			for i in range(5):
+			for _ in range(5):
 				d, c = self.scan_chute(force_scan=True)
 				if d > 0:
 					distances.append(d)
-				self.logger.info(f"Calibration scan {i+1}: {d:.2f} inches")
+			if self.logger.isEnabledFor(logging.INFO):
+				# The join isn't deferred by logging, so skip it when INFO is filtered out
+				self.logger.info("Calibration scans: [%s] inches", ", ".join(f"{d:.2f}" for d in distances))
 			if distances:
-				self.calibration_data["empty_distance"] = float(np.mean(distances))
-				self.logger.info(f"Empty calibration: {self.calibration_data['empty_distance']:.2f} inches")
+				self.calibration_data[key] = sum(distances) / len(distances)
+				if mark_calibrated:
+					self.calibration_data["calibrated"] = True
+					self.save_calibration()
+				self._refresh_calibration_cache()
+				self._publish_status()
+				self.logger.info("%s calibration: %.2f inches", label.capitalize(), self.calibration_data[key])
 				return True
 			else:
-				self.logger.error("No valid distance readings for empty calibration")
+				self.logger.error("No valid distance readings for %s calibration", label)
 		except Exception as e:
-			self.logger.error(f"Calibration failed: {e}")
+			self.logger.error("Calibration failed: %s", e)
 		return False
 
+	def calibrate_empty(self) -> bool:
+		return self._calibrate("empty_distance", "empty", mark_calibrated=False)
+
 	def calibrate_full(self) -> bool:
-		if not self.lidar:
-			self.logger.warning("LiDAR not available for calibration")
-			return False
-		try:
-			distances = []
-			for i in range(5):
-				d, c = self.scan_chute(force_scan=True)
-				if d > 0:
-					distances.append(d)
-				self.logger.info(f"Calibration scan {i+1}: {d:.2f} inches")
-			if distances:
-				self.calibration_data["full_distance"] = float(np.mean(distances))
-				self.calibration_data["calibrated"] = True
-				self.save_calibration()
-				self.logger.info(f"Full calibration: {self.calibration_data['full_distance']:.2f} inches")
-				return True
-			else:
-				self.logger.error("No valid distance readings for full calibration")
-		except Exception as e:
-			self.logger.error(f"Calibration failed: {e}")
-		return False
+		return self._calibrate("full_distance", "full", mark_calibrated=True)
 
 	def filter_chute_measurements(self, scan_data: List) -> List[float]:
 		chute_distances = []
@@ -212,8 +254,30 @@ class ChuteMonitor:
 		return chute_distances
 
 	def simulate_scan(self) -> float:
-		import random
-		return random.uniform(180, 1000)
+		return _sim_rng.uniform(180, 1000)
+
+	def _read_lidar(self, ready: bool = False):
+		"""Drain everything the driver has buffered into _rx, keeping the newest RX_BUFFER_MAX bytes.
+
+		ready means the selector just reported the port readable; getting no data then
+		is how a disconnected device shows up.
+		"""
+		fd = self.lidar.fileno()
+		got_data = False
+		while True:
+			try:
+				chunk = os.read(fd, RX_READ_SIZE)
+			except (BlockingIOError, InterruptedError):
+				break
+			# pyserial sets VMIN=0/VTIME=0, so a drained tty returns b'' rather than EAGAIN
+			if not chunk:
+				break
+			got_data = True
+			self._rx += chunk
+			if len(self._rx) > RX_BUFFER_MAX:
+				del self._rx[:-RX_BUFFER_MAX]
+		if ready and not got_data:
+			raise serial.SerialException("device reports readiness to read but returned no data (device disconnected?)")
 
 	def scan_chute(self, force_scan: bool = False) -> Tuple[float, float]:
 		# Always allow scanning if force_scan is True, even if not calibrated
@@ -224,66 +288,56 @@ class ChuteMonitor:
 			confidence = 0.8
 			return distance, confidence
 		try:
-			# TF-Luna UART frame (9 bytes): 0x59 0x59 Dist_L Dist_H Strength_L Strength_H Temp_L Temp_H Checksum
-			# Try multiple times to get a valid reading
-			for attempt in range(5):  # Reduced attempts to avoid blocking
-				try:
-					# Clear any old data
-					self.lidar.reset_input_buffer()
-					
-					# Look for the header bytes
-					header_found = False
-					for _ in range(10):  # Reduced header search attempts
-						b1 = self.lidar.read(1)
-						if b1 == b'\x59':
-							b2 = self.lidar.read(1)
-							if b2 == b'\x59':
-								header_found = True
-								break
-					
-					if not header_found:
-						continue
-					
-					# Read the rest of the frame
-					payload = self.lidar.read(7)
-					if len(payload) != 7:
-						continue
-					
-					frame = b'\x59\x59' + payload
-					checksum_ok = (sum(frame[:8]) & 0xFF) == frame[8]
-					if not checksum_ok:
-						continue
-					
-					dist_cm = frame[2] | (frame[3] << 8)
-					strength = frame[4] | (frame[5] << 8)
-					
-					# Convert cm to inches and compute confidence
-					distance = float(dist_cm) * 10.0 / 25.4  # Convert mm to inches
-					confidence = min(max(strength / 500.0, 0.0), 1.0)
-					
-					# Only return if we got a reasonable reading (in inches)
-					if distance > 0 and distance < 2000:  # Reasonable range in inches
-						return distance, confidence
-				except Exception as e:
-					# If we get a serial error, try again
-					if "device disconnected" in str(e) or "multiple access" in str(e):
-						continue
-					else:
-						raise e
-			
-			# If we couldn't get a valid reading after all attempts
-			return 0.0, 0.0
+			# One reader at a time: the monitor thread and /api/scan share the UART
+			with self._lidar_lock:
+				# TF-Luna UART frame (9 bytes): 0x59 0x59 Dist_L Dist_H Strength_L Strength_H Temp_L Temp_H Checksum
+				# Try multiple times to get a valid reading
+				for attempt in range(5):  # Reduced attempts to avoid blocking
+					try:
+						if not attempt:
+							# Drain whatever queued up since the last call (the port is only read
+							# here, so the backlog grows between scans and while stopped)
+							self._read_lidar()
+						elif self._lidar_sel.select(timeout=0.1):
+							# Nothing usable buffered - take what the sensor sent since
+							self._read_lidar(ready=True)
+						else:
+							continue
+						
+						# Use the newest frame; anything older than it is stale
+						idx, dist_cm, strength = _find_frame(self._rx)
+						if idx < 0:
+							# Keep the tail in case it is the start of a partial frame
+							del self._rx[:-8]
+							continue
+						del self._rx[:idx + 9]
+						
+						# Convert cm to inches and compute confidence
+						distance = float(dist_cm) * 10.0 / 25.4  # Convert mm to inches
+						confidence = min(max(strength / 500.0, 0.0), 1.0)
+						
+						# Only return if we got a reasonable reading (in inches)
+						if distance > 0 and distance < 2000:  # Reasonable range in inches
+							return distance, confidence
+					except Exception as e:
+						# If we get a serial error, try again
+						if "device disconnected" in str(e) or "multiple access" in str(e):
+							continue
+						else:
+							raise e
+				
+				# If we couldn't get a valid reading after all attempts
+				return 0.0, 0.0
 		except Exception as e:
-			self.logger.error(f"Scan failed: {e}")
+			self.logger.error("Scan failed: %s", e)
 			return 0.0, 0.0
 
 	def determine_chute_status(self, distance: float, confidence: float) -> str:
-		if not self.calibration_data["calibrated"]:
+		cal_ok, empty_d, full_d, inv_range = self._cal
+		if not cal_ok:
 			return "unknown"
 		if confidence < 0.1:  # Lower confidence threshold
 			return "unknown"
-		empty_d = self.calibration_data["empty_distance"]
-		full_d = self.calibration_data["full_distance"]
 		
 		# Handle edge cases where distance is very close to calibration values
 		if distance <= full_d:
@@ -292,7 +346,7 @@ class ChuteMonitor:
 			return "empty"
 		
 		# Calculate fill percentage
-		fill = 1.0 - ((distance - full_d) / (empty_d - full_d))
+		fill = 1.0 - (distance - full_d) * inv_range
 		fill = max(0.0, min(1.0, fill))
 		
 		if fill >= self.config.full_threshold:
@@ -317,6 +371,7 @@ class ChuteMonitor:
 		self.status.confidence = c
 		self.status.last_scan = datetime.now()
 		self.status.raw_distance = d
+		self._publish_status()
 		
 		# Set light color based on status - only 2 states
 		if fs == "full" or fs == "needs_attention":
@@ -324,32 +379,50 @@ class ChuteMonitor:
 		else:
 			self.set_light_color("green")  # Green = Empty (or anything else)
 		
-		self.logger.info(f"Chute status: {fs} (distance: {d:.2f} inches, confidence: {c:.2f})")
+		# Only log transitions - a line per scan floods the log on the Pi's SD card
+		if fs != self._prev_logged_status:
+			self.logger.info("Chute status: %s (distance: %.2f inches, confidence: %.2f)", fs, d, c)
+			self._prev_logged_status = fs
 
 	def start_monitoring(self):
 		if self.running: return
 		self.running = True
+		self._stop_event.clear()
 		self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
+		self._publish_status()
 		self.monitor_thread.start()
 		self.logger.info("Chute monitoring started")
 
 	def stop_monitoring(self):
 		self.running = False
+		self._stop_event.set()  # Wake the loop now instead of after its current sleep
+		self._publish_status()
 		if self.monitor_thread:
 			self.monitor_thread.join()
 		self.logger.info("Chute monitoring stopped")
 
 	def _monitor_loop(self):
+		# Schedule against absolute monotonic deadlines so scan time doesn't add drift
+		next_t = time.monotonic()
 		while self.running:
 			try:
+				interval = self.config.scan_interval
 				self.update_status()
-				time.sleep(self.config.scan_interval)
+				next_t += interval
+				delay = next_t - time.monotonic()
+				if delay > 0:
+					self._stop_event.wait(delay)
+				else:
+					# Fell behind (slow scan) - restart the schedule instead of bursting
+					next_t = time.monotonic()
 			except Exception as e:
-				self.logger.error(f"Monitoring loop error: {e}")
-				time.sleep(5)
+				self.logger.error("Monitoring loop error: %s", e)
+				self._stop_event.wait(5)
+				next_t = time.monotonic()
 
-	def get_status_json(self) -> Dict:
-		return {
+	def _publish_status(self):
+		"""Rebuild the status snapshot served to readers; call after any status change"""
+		snapshot = {
 			"status": self.status.status,
 			"confidence": self.status.confidence,
 			"last_scan": self.status.last_scan.isoformat(),
@@ -358,9 +431,22 @@ class ChuteMonitor:
 			"calibrated": self.calibration_data["calibrated"],
 			"running": self.running
 		}
+		body = json.dumps(snapshot).encode()
+		# One tuple, one reference swap: both getters always see the same scan
+		self._published_status = (snapshot, body, format(zlib.crc32(body), '08x'))
+
+	def get_status_json(self) -> Dict:
+		return self._published_status[0]
+
+	def get_status_body(self) -> Tuple[bytes, str]:
+		"""Pre-encoded JSON status and its ETag, for serving without re-encoding"""
+		_, body, etag = self._published_status
+		return body, etag
 
 	def cleanup(self):
 		self.stop_monitoring()
+		if self._lidar_sel:
+			self._lidar_sel.close()
 		if self.lidar:
 			try:
 				self.lidar.close()
@@ -368,9 +454,7 @@ class ChuteMonitor:
 				pass
 		if self.light:
 			try:
-				self.light.write(bytes([0x21]))  # RED_OFF
-				self.light.write(bytes([0x22]))  # YELLOW_OFF
-				self.light.write(bytes([0x24]))  # GREEN_OFF
+				self.light.write(_LIGHT_CMDS["off"])
 				self.light.close()
 			except Exception:
 				pass
@@ -3,9 +3,10 @@
 Web UI for Chute Monitor
 """
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from chute_monitor import get_monitor
 from datetime import datetime
+import os
 
 app = Flask(__name__)
 monitor = get_monitor()
@@ -17,7 +18,12 @@ def index():
 
 @app.get("/api/status")
 def api_status():
-	return jsonify(monitor.get_status_json())
+	# Body is encoded once per status change by the monitor; pollers revalidate via ETag
+	body, etag = monitor.get_status_body()
+	resp = Response(body, mimetype="application/json")
+	resp.set_etag(etag)
+	resp.cache_control.no_cache = True
+	return resp.make_conditional(request)
 
 @app.post("/api/calibrate/empty")
 def api_calibrate_empty():
@@ -48,6 +54,7 @@ def api_scan():
 	monitor.status.confidence = confidence
 	monitor.status.last_scan = datetime.now()
 	monitor.status.status = status
+	monitor._publish_status()
 	return jsonify(monitor.get_status_json())
 
 @app.get("/api/config")
@@ -78,9 +85,12 @@ def api_clear_calibration():
 		"chute_angle_range": [0, 30],
 		"calibrated": False
 	}
-	import os
-	if os.path.exists(monitor.config.calibration_file):
+	monitor._refresh_calibration_cache()
+	monitor._publish_status()
+	try:
 		os.remove(monitor.config.calibration_file)
+	except FileNotFoundError:
+		pass
 	return jsonify({"success": True})
 
 if __name__ == "__main__":